@@ -3,9 +3,28 @@
 #Copyright (C) 2026  Thaddäus Sobe
 
 
+import argparse
+import atexit
+import bisect
+import contextlib
+import gc
+import gzip
+import hashlib
+import heapq
+import io
+import json
+import mmap
+import os
 import re
+import struct
+import sys
 import textwrap
+import threading
+import time
+import tracemalloc
 import tkinter as tk
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import font
 
 import pandas as pd
@@ -18,6 +37,12 @@ try:
 except Exception:
     SCREENINFO_AVAILABLE = False
 
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except Exception:
+    PSUTIL_AVAILABLE = False
+
 
 # =================== Konfiguration ===================
 CLIENT_ID = "YOUR_SPOTIFY_CLIENT_ID"
@@ -25,20 +50,41 @@ CLIENT_SECRET = "YOUR_CLIENT_SECRET"
 REDIRECT_URI = "YOUR_SPOTIFY_REDIRECT_URL"
 
 CSV_FILE = "tanz-mapping.csv"
+MAPPING_INDEX_SUFFIX = ".idx"   # kompilierter Index neben der CSV ("" = aus, CSV direkt laden)
 SCOPE = "user-read-currently-playing user-read-playback-state"
 
-
-
-
-
-sp = spotipy.Spotify(
-    auth_manager=SpotifyOAuth(
-        client_id=CLIENT_ID,
-        client_secret=CLIENT_SECRET,
-        redirect_uri=REDIRECT_URI,
-        scope=SCOPE,
+# Multi-Room: ein Eintrag pro Saal (eigener Spotify-Account, eigener Token-Cache).
+# Leer = klassischer Einzelbetrieb mit einem Fenster.
+# Beispiel:
+#   ROOMS = [
+#       {"name": "Saal 1", "cache_path": ".cache-saal1"},
+#       {"name": "Saal 2", "cache_path": ".cache-saal2"},
+#       {"name": "Saal 3", "cache_path": ".cache-saal3", "headless": True},
+#   ]
+ROOMS = []
+# Anzeige: "label" (klassisch, drei Labels) oder "canvas" (ein Canvas mit weichen Übergängen)
+RENDERER = "label"
+TRANSITION = "fade"         # nur Canvas: "fade", "slide" oder "cut"
+TRANSITION_MS = 400
+FRAME_MS = 16               # Frame-Budget der Animationen (~60 fps)
+
+POLL_WORKERS = 4            # parallele Spotify-Abfragen (Multi-Room)
+PLAYLIST_CACHE_TTL = 300    # Sekunden, bis eine Playlist neu geladen wird
+PLAYLIST_FETCH_WORKERS = 4  # parallele Seitenabrufe beim Laden großer Playlists
+PLAYLIST_FIELDS = "total,items(track(name,artists(name)))"
+AUTO_CONTEXT = True         # laufende Playlist/Album automatisch als Reihenfolge-Quelle nutzen
+
+
+def create_spotify(cache_path: str | None = None) -> spotipy.Spotify:
+    return spotipy.Spotify(
+        auth_manager=SpotifyOAuth(
+            client_id=CLIENT_ID,
+            client_secret=CLIENT_SECRET,
+            redirect_uri=REDIRECT_URI,
+            scope=SCOPE,
+            cache_path=cache_path,
+        )
     )
-)
 
 
 # =================== Helpers ===================
@@ -101,12 +147,643 @@ def wrap_for_label_if_needed(text: str, width_px: int, font_obj: font.Font) -> s
     return "\n".join(lines)
 
 
+# =================== Mapping / Playlist-Cache ===================
+def _mapping_key(title: str, artist: str) -> bytes:
+    return f"{normalize(title)}\x1f{normalize(artist)}".encode("utf-8")
+
+
+def _mapping_key_hash(key: bytes) -> int:
+    # Stabil über Prozesse hinweg (hash() ist pro Prozess randomisiert)
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+class CompiledMapping:
+    """
+    Vorkompilierter Mapping-Index: Hash-Tabelle (offene Adressierung) + String-Pool in einer Datei.
+    Wird per mmap geöffnet; Lookups lesen direkt aus dem Puffer, ohne pro Zeile Python-Objekte
+    anzulegen. Mehrere Prozesse auf demselben Rechner teilen sich die Seiten.
+
+    Layout: Header | Slots | Werte-Tabelle | Stil-Tabelle | String-Pool
+    """
+
+    MAGIC = b"DNCYIDX1"
+    HEADER = struct.Struct("<8s32sIII")     # magic, sha256 der CSV, n_slots, n_values, n_styles
+    SLOT = struct.Struct("<QIII")           # key_hash, key_off, key_len, value_idx
+    REF = struct.Struct("<II")              # offset, länge im String-Pool
+    EMPTY = 0xFFFFFFFF
+
+    def __init__(self, buf):
+        self.buf = buf
+        magic, self.source_hash, self.n_slots, n_values, n_styles = self.HEADER.unpack_from(buf, 0)
+        if magic != self.MAGIC:
+            raise ValueError("Kein Dancify-Mapping-Index")
+        self._slots_off = self.HEADER.size
+        self._values_off = self._slots_off + self.n_slots * self.SLOT.size
+        styles_off = self._values_off + n_values * self.REF.size
+        self.styles = [self._string(styles_off, i) for i in range(n_styles)]
+        self._values = {}
+
+    def _string(self, table_off: int, i: int) -> str:
+        off, ln = self.REF.unpack_from(self.buf, table_off + i * self.REF.size)
+        return bytes(self.buf[off:off + ln]).decode("utf-8")
+
+    def lookup(self, title: str, artist: str):
+        key = _mapping_key(title, artist)
+        h = _mapping_key_hash(key)
+        mask = self.n_slots - 1
+        i = h & mask
+        while True:
+            kh, off, ln, v = self.SLOT.unpack_from(self.buf, self._slots_off + i * self.SLOT.size)
+            if v == self.EMPTY:
+                return None
+            if kh == h and self.buf[off:off + ln] == key:
+                value = self._values.get(v)
+                if value is None:
+                    value = self._values[v] = self._string(self._values_off, v)
+                return value
+            i = (i + 1) & mask
+
+    @classmethod
+    def build(cls, rows, styles: list[str], source_hash: bytes) -> bytes:
+        """rows: (titel, interpret, tanzstil) – bei doppelten Songs gewinnt die erste Zeile."""
+        entries = {}
+        values, value_idx = [], {}
+        for t, a, s in rows:
+            key = _mapping_key(t, a)
+            if key in entries:
+                continue
+            v = s.upper()
+            if v not in value_idx:
+                value_idx[v] = len(values)
+                values.append(v)
+            entries[key] = value_idx[v]
+
+        n_slots = 8
+        while n_slots < 2 * len(entries):
+            n_slots *= 2
+
+        pool_off = (cls.HEADER.size + n_slots * cls.SLOT.size
+                    + (len(values) + len(styles)) * cls.REF.size)
+        pool = bytearray()
+
+        def intern(b: bytes):
+            off = pool_off + len(pool)
+            pool.extend(b)
+            return off, len(b)
+
+        slots = bytearray(cls.SLOT.pack(0, 0, 0, cls.EMPTY) * n_slots)
+        mask = n_slots - 1
+        for key, v in entries.items():
+            h = _mapping_key_hash(key)
+            i = h & mask
+            while cls.SLOT.unpack_from(slots, i * cls.SLOT.size)[3] != cls.EMPTY:
+                i = (i + 1) & mask
+            off, ln = intern(key)
+            cls.SLOT.pack_into(slots, i * cls.SLOT.size, h, off, ln, v)
+
+        refs = bytearray()
+        for s in values + styles:
+            refs.extend(cls.REF.pack(*intern(s.encode("utf-8"))))
+
+        header = cls.HEADER.pack(cls.MAGIC, source_hash, n_slots, len(values), len(styles))
+        return bytes(header + slots + refs + pool)
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+
+    @classmethod
+    def open(cls, index_path: str):
+        with open(index_path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(mm)
+        except (ValueError, struct.error):
+            mm.close()
+            raise
+
+    @classmethod
+    def load(cls, csv_path: str, index_path: str, stale=None):
+        """
+        Öffnet den Index; baut ihn neu, wenn er fehlt oder der Hash der CSV nicht mehr passt.
+        `stale`: bisher in diesem Prozess gemappter Index, wird vor dem Ersetzen der Datei geschlossen.
+        """
+        with open(csv_path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).digest()
+
+        try:
+            table = cls.open(index_path)
+            if table.source_hash == digest:
+                if stale is not None:
+                    stale.close()
+                return table
+            # Veralteter Index: Mapping schließen, sonst scheitert os.replace unter Windows
+            table.close()
+        except (OSError, ValueError, struct.error):
+            pass
+
+        df = pd.read_csv(io.BytesIO(data)).fillna("")
+        col_s = df["dance_style"].astype(str)
+        styles = sorted(set(s.strip() for s in col_s if s.strip()))
+        blob = cls.build(zip(df["song_title"].astype(str), df["artist"].astype(str), col_s), styles, digest)
+
+        if stale is not None:
+            stale.close()
+
+        tmp = f"{index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(blob)
+            os.replace(tmp, index_path)
+            return cls.open(index_path)
+        except OSError:
+            # z.B. Windows: ein anderer Prozess hat den alten Index noch gemappt -> diesmal aus dem Speicher
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return cls(blob)
+
+
+class MappingIndex:
+    """
+    Song→Tanz-Zuordnung aus der CSV: (normalisierter Titel, Interpret) → Tanzstil.
+    Standardmäßig über den kompilierten Index (CompiledMapping), sonst als Dict.
+    Wird einmal geladen und im Multi-Room-Betrieb von allen Räumen geteilt.
+    """
+
+    def __init__(self, path: str = CSV_FILE):
+        self.path = path
+        self.styles = []
+        self._index = {}
+        self._table = None
+        self._lock = threading.Lock()   # kein Lookup auf einem gerade geschlossenen Mapping
+        self.reload()
+
+    def reload(self):
+        if MAPPING_INDEX_SUFFIX:
+            with self._lock:
+                stale, self._table = self._table, None
+                try:
+                    table = CompiledMapping.load(self.path, self.path + MAPPING_INDEX_SUFFIX, stale=stale)
+                except Exception:
+                    self._table = stale
+                    raise
+                self._table = table
+                self.styles = table.styles
+            return
+
+        df = pd.read_csv(self.path).fillna("")
+        index = {}
+        for t, a, s in zip(df["song_title"].astype(str), df["artist"].astype(str), df["dance_style"].astype(str)):
+            index.setdefault((normalize(t), normalize(a)), s.upper())
+        styles = sorted(set(s.strip() for s in df["dance_style"].astype(str) if s.strip()))
+        # Erst komplett aufbauen, dann tauschen: laufende Lookups anderer Räume sehen nie einen halben Index.
+        self._index = index
+        self._table = None
+        self.styles = styles
+
+    def find_style(self, title: str, artist: str):
+        with self._lock:
+            table = self._table
+            if table is not None:
+                return table.lookup(title, artist)
+        return self._index.get((normalize(title), normalize(artist)))
+
+
+class PlaylistCache:
+    """
+    Tracklisten von Playlists und Alben inkl. Positionsindex, threadsicher und von allen Räumen geteilt.
+    Eine Liste wird höchstens alle `ttl` Sekunden neu von Spotify geladen.
+    background=False lädt auch „im Hintergrund“ angeforderte Listen sofort im Aufrufer –
+    für Replay/Soak-Test, damit die Ergebnisse nicht vom Thread-Timing abhängen.
+    """
+
+    PAGE_SIZE = {"playlist": 100, "album": 50}
+
+    def __init__(self, ttl: float = PLAYLIST_CACHE_TTL, background: bool = True, clock=time.monotonic):
+        self.ttl = ttl
+        self.background = background
+        self.clock = clock      # für das TTL; Replay/Soak-Test übergeben ihre simulierte Uhr
+        self._lock = threading.Lock()
+        self._entries = {}      # (kind, id) -> (geladen_um, tracks, positions)
+        self._load_locks = {}   # (kind, id) -> Lock (nur ein Raum lädt, die anderen warten)
+        self._warming = set()   # (kind, id), die gerade im Hintergrund geladen werden
+        self._not_before = 0.0  # Rate-Limit: vor diesem Zeitpunkt keine neuen Seitenabrufe
+
+    def _fresh(self, key: tuple):
+        entry = self._entries.get(key)
+        if entry and self.clock() - entry[0] < self.ttl:
+            return entry
+        return None
+
+    def get(self, client, item_id: str, kind: str = "playlist", wait: bool = True):
+        """
+        Liefert (geladen_um, tracks, positions). Mit wait=False wird nie im Aufrufer geladen:
+        fehlt die Liste oder ist sie veraltet, lädt ein Hintergrund-Thread, zurück kommt der
+        bisherige Stand (oder None).
+        """
+        key = (kind, item_id)
+        wait = wait or not self.background
+        with self._lock:
+            entry = self._fresh(key)
+            if entry:
+                return entry
+            if not wait:
+                self._start_warm(client, key)
+                return self._entries.get(key)
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                entry = self._fresh(key)
+            if entry:
+                return entry
+
+            tracks = self._fetch(client, kind, item_id)
+            positions = {}
+            for i, tr in enumerate(tracks):
+                positions.setdefault((normalize(tr["name"]), normalize(tr["artist"])), i)
+            entry = (self.clock(), tracks, positions)
+            with self._lock:
+                self._entries[key] = entry
+            return entry
+
+    def warm(self, client, item_id: str, kind: str = "playlist"):
+        """Lädt die Liste im Hintergrund vor, falls sie nicht schon frisch im Cache liegt."""
+        if not self.background:
+            try:
+                self.get(client, item_id, kind=kind)
+            except Exception:
+                pass
+            return
+        with self._lock:
+            if not self._fresh((kind, item_id)):
+                self._start_warm(client, (kind, item_id))
+
+    def _start_warm(self, client, key: tuple):
+        # Aufruf nur mit gehaltenem self._lock
+        if key in self._warming:
+            return
+        self._warming.add(key)
+
+        def run():
+            try:
+                self.get(client, key[1], kind=key[0])
+            except Exception:
+                pass
+            finally:
+                with self._lock:
+                    self._warming.discard(key)
+
+        threading.Thread(target=run, name="dancify-warm", daemon=True).start()
+
+    def tracks_after(self, client, item_id: str, title: str, artist: str, n: int,
+                     kind: str = "playlist", wait: bool = True):
+        entry = self.get(client, item_id, kind=kind, wait=wait)
+        if entry is None:
+            return []
+        _, tracks, positions = entry
+        i = positions.get((normalize(title), normalize(artist)))
+        if i is None:
+            return []
+        return tracks[i + 1:i + 1 + n]
+
+    @staticmethod
+    def _tracks_from_page(resp: dict):
+        tracks = []
+        for it in resp.get("items") or []:
+            # Playlist-Einträge kapseln den Track, Album-Einträge sind selbst Tracks
+            tr = (it.get("track") if "track" in it else it) or {}
+            name = (tr.get("name") or "").strip()
+            artists = tr.get("artists") or []
+            artist = (artists[0].get("name") if artists else "").strip()
+            if name and artist:
+                tracks.append({"name": name, "artist": artist})
+        return tracks
+
+    def _fetch_page(self, client, kind: str, item_id: str, offset: int):
+        for attempt in range(4):
+            # Nach einem 429 warten alle Worker gemeinsam, bis Spotify wieder Anfragen annimmt
+            with self._lock:
+                wait = self._not_before - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                if kind == "album":
+                    return client.album_tracks(item_id, limit=self.PAGE_SIZE[kind], offset=offset)
+                return client.playlist_items(item_id, limit=self.PAGE_SIZE[kind], offset=offset,
+                                             fields=PLAYLIST_FIELDS)
+            except spotipy.SpotifyException as e:
+                if e.http_status != 429 or attempt == 3:
+                    raise
+                retry_after = float((e.headers or {}).get("Retry-After") or 1)
+                with self._lock:
+                    self._not_before = max(self._not_before, time.monotonic() + retry_after)
+
+    def _fetch(self, client, kind: str, item_id: str):
+        """Erste Seite holen, `total` lesen, restliche Seiten parallel laden und in Reihenfolge zusammensetzen."""
+        page_size = self.PAGE_SIZE[kind]
+        first = self._fetch_page(client, kind, item_id, 0)
+        offsets = range(page_size, first.get("total") or 0, page_size)
+        if not offsets:
+            return self._tracks_from_page(first)
+
+        with ThreadPoolExecutor(max_workers=min(PLAYLIST_FETCH_WORKERS, len(offsets)),
+                                thread_name_prefix="dancify-playlist") as pool:
+            pages = list(pool.map(lambda off: self._fetch_page(client, kind, item_id, off), offsets))
+
+        tracks = self._tracks_from_page(first)
+        for page in pages:
+            tracks += self._tracks_from_page(page)
+        return tracks
+
+
+# =================== Ausgabe ===================
+class LabelDisplay:
+    """Klassische Anzeige: drei Labels, vertikale Ausrichtung über Spacer-Frames."""
+
+    def __init__(self, root, info_font: font.Font, dance_font: font.Font, next_font: font.Font):
+        # Layout (vertikale Zentrierung via Spacer)
+        self.container = tk.Frame(root, bg="black")
+        self.container.pack(fill="both", expand=True)
+
+        self.top_spacer = tk.Frame(self.container, bg="black")
+        self.mid_frame = tk.Frame(self.container, bg="black")
+        self.bot_spacer = tk.Frame(self.container, bg="black")
+
+        self.top_spacer.pack(fill="both", expand=True)
+        self.mid_frame.pack(fill="both", expand=False)
+        self.bot_spacer.pack(fill="both", expand=True)
+
+        self.info_label = tk.Label(self.mid_frame, text="", fg="gray", bg="black",
+                                   font=info_font, justify="center")
+        self.info_label.pack(pady=(15, 10), fill="x")
+
+        self.dance_label = tk.Label(self.mid_frame, text="⏳", fg="white", bg="black",
+                                    font=dance_font, justify="center")
+        self.dance_label.pack(pady=(10, 10), fill="x")
+
+        self.next_label = tk.Label(self.mid_frame, text="", fg="grey", bg="black",
+                                   font=next_font, justify="center")
+        self.next_label.pack(pady=(10, 15), fill="x")
+
+    def show(self, info: str, dance: str, nxt: str):
+        self.info_label.config(text=info)
+        self.dance_label.config(text=dance)
+        self.next_label.config(text=nxt)
+
+    def set_next(self, nxt: str):
+        self.next_label.config(text=nxt)
+
+    def apply_alignment(self, h_align: str, v_align: str):
+        if h_align == "left":
+            anchor, justify = "w", "left"
+        elif h_align == "right":
+            anchor, justify = "e", "right"
+        else:
+            anchor, justify = "center", "center"
+
+        for lbl in (self.info_label, self.dance_label, self.next_label):
+            lbl.config(anchor=anchor, justify=justify)
+
+        if v_align == "top":
+            self.top_spacer.pack_configure(expand=False)
+            self.bot_spacer.pack_configure(expand=True)
+        elif v_align == "bottom":
+            self.top_spacer.pack_configure(expand=True)
+            self.bot_spacer.pack_configure(expand=False)
+        else:
+            self.top_spacer.pack_configure(expand=True)
+            self.bot_spacer.pack_configure(expand=True)
+
+
+class CanvasDisplay:
+    """
+    Anzeige auf einem einzigen tk.Canvas: die drei Textelemente werden in place geändert,
+    Wechsel laufen als Überblendung/Slide über einen Frame-Scheduler (FRAME_MS).
+    Solange nichts animiert, ist kein Frame eingeplant.
+    """
+
+    PADS = ((15, 10), (10, 10), (10, 15))   # wie pady der Labels
+    MARGIN = 10
+
+    def __init__(self, root, info_font: font.Font, dance_font: font.Font, next_font: font.Font,
+                 transition: str = TRANSITION, duration_ms: int = TRANSITION_MS, frame_ms: int = FRAME_MS):
+        self.root = root
+        self.transition = transition
+        self.duration = duration_ms / 1000
+        self.frame_ms = frame_ms
+        self.h_align = "center"
+        self.v_align = "middle"
+
+        self.canvas = tk.Canvas(root, bg="black", highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True)
+        self.canvas.bind("<Configure>", lambda e: self._layout())
+
+        colors = ("gray", "white", "grey")
+        fonts = (info_font, dance_font, next_font)
+        self.items = [self.canvas.create_text(0, 0, text="", font=f, fill=c) for f, c in zip(fonts, colors)]
+        self.canvas.itemconfigure(self.items[1], text="⏳")
+        self._rgb = {it: root.winfo_rgb(c) for it, c in zip(self.items, colors)}
+        self._texts = ["", "⏳", ""]
+        self._base = {it: (0, 0) for it in self.items}
+
+        self._anim = None
+        self._frame_job = None
+
+    # --- Layout ---
+    def _layout(self):
+        w = max(1, self.canvas.winfo_width())
+        h = max(1, self.canvas.winfo_height())
+
+        if self.h_align == "left":
+            x, anchor, justify = self.MARGIN, "nw", "left"
+        elif self.h_align == "right":
+            x, anchor, justify = w - self.MARGIN, "ne", "right"
+        else:
+            x, anchor, justify = w // 2, "n", "center"
+
+        heights = []
+        for it in self.items:
+            self.canvas.itemconfigure(it, anchor=anchor, justify=justify)
+            bbox = self.canvas.bbox(it) if self.canvas.itemcget(it, "text") else None
+            heights.append(bbox[3] - bbox[1] if bbox else 0)
+        block = sum(heights) + sum(a + b for a, b in self.PADS)
+
+        if self.v_align == "top":
+            y = 0
+        elif self.v_align == "bottom":
+            y = h - block
+        else:
+            y = (h - block) // 2
+
+        for it, ht, (pad_top, pad_bottom) in zip(self.items, heights, self.PADS):
+            y += pad_top
+            self._base[it] = (x, y)
+            y += ht + pad_bottom
+
+        if self._anim is None:
+            for it in self.items:
+                self.canvas.coords(it, *self._base[it])
+        else:
+            self._draw(time.monotonic())
+
+    # --- Öffentliche Schnittstelle (wie LabelDisplay) ---
+    def show(self, info: str, dance: str, nxt: str):
+        texts = [info, dance, nxt]
+        if self._anim is not None:
+            self._finish()
+        changed = [i for i in range(3) if texts[i] != self._texts[i]]
+        if not changed:
+            return
+        self._texts = texts
+
+        if self.transition not in ("fade", "slide"):
+            for i in changed:
+                self.canvas.itemconfigure(self.items[i], text=texts[i])
+            self._layout()
+            return
+
+        self._anim = {"start": time.monotonic(), "items": [self.items[i] for i in changed],
+                      "texts": {self.items[i]: texts[i] for i in changed}, "swapped": False}
+        self._schedule()
+
+    def set_next(self, nxt: str):
+        self.show(self._texts[0], self._texts[1], nxt)
+
+    def apply_alignment(self, h_align: str, v_align: str):
+        self.h_align = h_align
+        self.v_align = v_align
+        self._layout()
+
+    # --- Frame-Scheduler ---
+    def _schedule(self):
+        if self._frame_job is None:
+            self._frame_job = self.root.after(self.frame_ms, self._frame)
+
+    def _frame(self):
+        self._frame_job = None
+        if self._anim is None:
+            return
+        if self._draw(time.monotonic()):
+            self._schedule()
+
+    def _draw(self, now: float) -> bool:
+        """Zeichnet den Animationsstand zum Zeitpunkt `now`; False, wenn die Animation fertig ist."""
+        anim = self._anim
+        p = (now - anim["start"]) / self.duration if self.duration > 0 else 1.0
+        if p >= 1.0:
+            self._finish()
+            return False
+
+        if p < 0.5:
+            q = 1.0 - p * 2      # alter Text: 1 -> 0
+            sign = -1
+        else:
+            if not anim["swapped"]:
+                anim["swapped"] = True
+                for it, txt in anim["texts"].items():
+                    self.canvas.itemconfigure(it, text=txt)
+                self._anim = None       # Layout ohne Animation berechnen ...
+                self._layout()
+                self._anim = anim       # ... und weiter animieren
+            q = (p - 0.5) * 2    # neuer Text: 0 -> 1
+            sign = 1
+
+        width = max(1, self.canvas.winfo_width())
+        for it in anim["items"]:
+            x, y = self._base[it]
+            if self.transition == "slide":
+                self.canvas.coords(it, x + sign * (1.0 - q) * width, y)
+            else:
+                self.canvas.itemconfigure(it, fill=self._fade(it, q))
+        return True
+
+    def _finish(self):
+        anim, self._anim = self._anim, None
+        if anim is None:
+            return
+        for it in anim["items"]:
+            if not anim["swapped"]:
+                self.canvas.itemconfigure(it, text=anim["texts"][it])
+            self.canvas.itemconfigure(it, fill=self._fade(it, 1.0))
+        self._layout()
+
+    def _fade(self, item, q: float) -> str:
+        r, g, b = (int(c / 257 * q) for c in self._rgb[item])
+        return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def _console_prefix(name: str, clock=None) -> str:
+    if clock is None:
+        return f"[{name}]"
+    t = int(clock())
+    return f"[{name} {t // 3600:02d}:{t % 3600 // 60:02d}:{t % 60:02d}]"
+
+
+class ConsoleDisplay:
+    """Headless-Ausgabe: schreibt nur Änderungen der Anzeige auf stdout."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.clock = None       # optional: Zeitstempel (Sekunden) vor jeder Zeile, z.B. beim Replay
+        self._shown = ("", "", "")
+
+    def show(self, info: str, dance: str, nxt: str):
+        shown = (info, dance, nxt)
+        if shown == self._shown:
+            return
+        self._shown = shown
+        parts = [p.replace("\n", " ") for p in (dance, info, nxt) if p]
+        print(f"{_console_prefix(self.name, self.clock)} " + ("  |  ".join(parts) if parts else "(leer)"),
+              flush=True)
+
+    def set_next(self, nxt: str):
+        self.show(self._shown[0], self._shown[1], nxt)
+
+    def apply_alignment(self, h_align: str, v_align: str):
+        pass
+
+
+class ConsoleStatus:
+    """Ersatz für tk.StringVar im Headless-Betrieb (gibt Statuswechsel auf stdout aus)."""
+
+    def __init__(self, name: str, value: str = ""):
+        self.name = name
+        self.clock = None
+        self._value = value
+
+    def get(self) -> str:
+        return self._value
+
+    def set(self, value: str):
+        if value != self._value:
+            print(f"{_console_prefix(self.name, self.clock)} Status: {value}", flush=True)
+        self._value = value
+
+
 # =================== App ===================
 class DanceDisplayApp:
-    def __init__(self):
-        self.df = pd.read_csv(CSV_FILE).fillna("")
-        self.styles = self._styles_from_csv()
-        
+    def __init__(self, sp=None, mapping: MappingIndex | None = None, playlist_cache: PlaylistCache | None = None,
+                 master=None, name: str = "", headless: bool = False, clock=None):
+        """
+        Standard: eigenes Tk-Fenster, eigener Spotify-Client, eigene CSV.
+        Multi-Room: `master` (gemeinsames Tk-Root) + geteilte `mapping`/`playlist_cache`;
+        die Update-Schleife übernimmt dann der RoomScheduler.
+        `clock` (VirtualClock): update_loop plant seine Ticks in simulierter Zeit ein (Soak-Test).
+        """
+        self.sp = sp or create_spotify()
+        self.mapping = mapping or MappingIndex(CSV_FILE)
+        self.playlist_cache = playlist_cache or PlaylistCache()
+        self.name = name
+        self.headless = headless
+        self.clock = clock
+        self.closed = False
+        self._owns_root = master is None and not headless
+        self._pending_status = None
+
         # Anzeige-Optionen
         self.show_title_artist = True
         self.h_align = "center"     # left/center/right
@@ -125,6 +802,8 @@ class DanceDisplayApp:
         # Next-Quelle
         self.use_queue_for_next = True
         self.playlist_id_fallback = ""
+        self.context = None     # automatisch erkannt: ("playlist"|"album", id) oder None
+        self.shuffle = True     # Zufallswiedergabe? Unbekannt = ja (Kontext-Reihenfolge nicht verwenden)
 
         # Fullscreen
         self._fs_on = False
@@ -136,11 +815,21 @@ class DanceDisplayApp:
         self.last_good_display = {"info": "", "dance": "⏳", "next": ""}
 
         # ---------- UI ----------
-        self.root = tk.Tk()
-        self.root.title("SpotiDance (Tanzstil-Anzeige)")
+        if headless:
+            self.root = None
+            self.dance_font = self.info_font = self.next_font = None
+            self.display = ConsoleDisplay(name or "Dancify")
+            self.status_var = ConsoleStatus(name or "Dancify", "Bereit.")
+            return
+
+        suffix = f" – {name}" if name else ""
+        self.root = tk.Tk() if master is None else tk.Toplevel(master)
+        self.root.title("SpotiDance (Tanzstil-Anzeige)" + suffix)
         self.root.configure(bg="black")
         self.root.geometry("900x500")
         self.root.iconbitmap("app.ico")
+        # Schließen des Anzeigefensters beendet den Raum (im Multi-Room-Betrieb nur diesen)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
 
         # Hotkeys
@@ -153,54 +842,30 @@ class DanceDisplayApp:
         self.info_font = font.Font(family="Open Sans", size=self.size_info)
         self.next_font = font.Font(family="Open Sans", size=self.size_next, weight="bold")
 
-        # Layout (vertikale Zentrierung via Spacer)
-        self.container = tk.Frame(self.root, bg="black")
-        self.container.pack(fill="both", expand=True)
-
-        self.top_spacer = tk.Frame(self.container, bg="black")
-        self.mid_frame = tk.Frame(self.container, bg="black")
-        self.bot_spacer = tk.Frame(self.container, bg="black")
-
-        self.top_spacer.pack(fill="both", expand=True)
-        self.mid_frame.pack(fill="both", expand=False)
-        self.bot_spacer.pack(fill="both", expand=True)
-
-        self.info_label = tk.Label(self.mid_frame, text="", fg="gray", bg="black",
-                                   font=self.info_font, justify="center")
-        self.info_label.pack(pady=(15, 10), fill="x")
-
-        self.dance_label = tk.Label(self.mid_frame, text="⏳", fg="white", bg="black",
-                                    font=self.dance_font, justify="center")
-        self.dance_label.pack(pady=(10, 10), fill="x")
-
-        self.next_label = tk.Label(self.mid_frame, text="", fg="grey", bg="black",
-                                   font=self.next_font, justify="center")
-        self.next_label.pack(pady=(10, 15), fill="x")
+        display_cls = CanvasDisplay if RENDERER == "canvas" else LabelDisplay
+        self.display = display_cls(self.root, self.info_font, self.dance_font, self.next_font)
 
         # Settings Window
         self.ctrl = tk.Toplevel(self.root)
-        self.ctrl.title("SpotiDance-Einstellungen")
+        self.ctrl.title("SpotiDance-Einstellungen" + suffix)
         self.ctrl.geometry("650x720")
         self.ctrl.protocol("WM_DELETE_WINDOW", self.on_close)
         self.ctrl.iconbitmap("app.ico")
 
-        self.status_var = tk.StringVar(value="Bereit.")
+        self.status_var = tk.StringVar(master=self.root, value="Bereit.")
         self._build_controls()
 
         self._apply_alignment()
         self._apply_fonts()
         self.force_redraw()
 
-        self.update_loop()
+        if self._owns_root:
+            self.update_loop()
 
     # ================= CSV =================
-    def _styles_from_csv(self):
-        return sorted(set(s.strip() for s in self.df["dance_style"].astype(str) if s.strip()))
-
     def reload_csv(self):
         try:
-            self.df = pd.read_csv(CSV_FILE).fillna("")
-            self.styles = self._styles_from_csv()
+            self.mapping.reload()
             self._refresh_overwrite_list()
             self.status_var.set("CSV neu geladen.")
             self.force_redraw()
@@ -208,42 +873,79 @@ class DanceDisplayApp:
             self.status_var.set(f"CSV Fehler: {e}")
 
     def _csv_find_style_for_track(self, title: str, artist: str):
-        t = normalize(title)
-        a = normalize(artist)
+        return self.mapping.find_style(title, artist)
 
-        col_t = self.df["song_title"].astype(str).map(normalize)
-        col_a = self.df["artist"].astype(str).map(normalize)
+    # ================= Status =================
+    def _set_status(self, msg: str):
+        # Im Multi-Room-Betrieb laufen die Spotify-Abfragen im Worker-Thread: Tk dort nicht anfassen.
+        if threading.current_thread() is threading.main_thread():
+            self.status_var.set(msg)
+        else:
+            self._pending_status = msg
 
-        m = (col_t == t) & (col_a == a)
-        idx = self.df.index[m].tolist()
-        if not idx:
-            return None
-        return str(self.df.loc[idx[0], "dance_style"]).upper()
+    def _flush_status(self):
+        msg, self._pending_status = self._pending_status, None
+        if msg is not None:
+            self.status_var.set(msg)
 
     # ================= Spotify current =================
     def get_current_track(self):
         try:
-            current = sp.current_user_playing_track()
+            # current_playback statt current_user_playing_track: gleiche Anfrage, liefert zusätzlich shuffle_state
+            current = self.sp.current_playback()
             if current and current.get("item"):
                 tr = current["item"]
                 name = tr.get("name") or ""
                 artists = tr.get("artists") or []
                 artist = (artists[0].get("name") if artists else "") or ""
                 if name and artist:
+                    # Fehlt shuffle_state (z.B. ältere Mitschnitte), ist die Reihenfolge unbekannt
+                    self.shuffle = bool(current.get("shuffle_state", True))
+                    self._note_context(current.get("context"))
                     return {"name": name, "artist": artist}
         except Exception as e:
-            self.status_var.set(f"Spotify Fehler (current): {e}")
+            self._set_status(f"Spotify Fehler (current): {e}")
+        return None
+
+    def _note_context(self, context: dict | None):
+        # Kommt kostenlos mit der current-Abfrage: bei Wechsel der Playlist/des Albums Trackliste vorladen
+        kind = (context or {}).get("type") or ""
+        ctx = None
+        if kind in ("playlist", "album"):
+            try:
+                ctx = (kind, spotify_id_from_input((context or {}).get("uri") or "", expected_type=kind))
+            except ValueError:
+                ctx = None
+        if ctx != self.context:
+            self.context = ctx
+            if ctx and AUTO_CONTEXT and not self.shuffle:
+                self.playlist_cache.warm(self.sp, ctx[1], kind=ctx[0])
+
+    def _order_source(self):
+        """
+        Reihenfolge-Quelle für Next/Liste: manuell gesetzte Playlist (lädt notfalls im Tick),
+        sonst der automatisch erkannte Kontext (nur aus dem Cache, lädt im Hintergrund).
+        Bei Zufallswiedergabe sagt die Kontext-Reihenfolge nichts über die nächsten Songs -> None.
+        Liefert (kind, id, wait) oder None.
+        """
+        if self.playlist_id_fallback.strip():
+            return ("playlist", self.playlist_id_fallback, True)
+        if AUTO_CONTEXT and self.context and not self.shuffle:
+            return (self.context[0], self.context[1], False)
         return None
 
     # ================= Spotify queue / next =================
+    def _fetch_queue(self):
+        # Spotipy hat in neueren Versionen sp.queue(), sonst internal endpoint:
+        if hasattr(self.sp, "queue"):
+            q = self.sp.queue()
+        else:
+            q = self.sp._get("me/player/queue")
+        return q.get("queue") or []
+
     def get_next_track_from_queue(self):
         try:
-            # Spotipy hat in neueren Versionen sp.queue(), sonst internal endpoint:
-            if hasattr(sp, "queue"):
-                q = sp.queue()
-            else:
-                q = sp._get("me/player/queue")
-            queue = q.get("queue") or []
+            queue = self._fetch_queue()
             if not queue:
                 return None
             tr = queue[0]
@@ -253,44 +955,22 @@ class DanceDisplayApp:
             if name and artist:
                 return {"name": name, "artist": artist}
         except Exception as e:
-            self.status_var.set(f"Spotify Fehler (queue): {e}")
+            self._set_status(f"Spotify Fehler (queue): {e}")
         return None
 
-    def get_next_track_from_playlist(self, playlist_id: str, current_title: str, current_artist: str):
+    def get_next_track_from_playlist(self, playlist_id: str, current_title: str, current_artist: str,
+                                     kind: str = "playlist", wait: bool = True):
         if not playlist_id.strip():
             return None
 
-        cur_t = normalize(current_title)
-        cur_a = normalize(current_artist)
-
         try:
-            offset = 0
-            found = False
-            while True:
-                resp = sp.playlist_items(playlist_id, limit=100, offset=offset)
-                items = resp.get("items") or []
-
-                for it in items:
-                    tr = it.get("track") or {}
-                    name = (tr.get("name") or "").strip()
-                    artists = tr.get("artists") or []
-                    artist = (artists[0].get("name") if artists else "").strip()
-
-                    if not name or not artist:
-                        continue
-
-                    if found:
-                        return {"name": name, "artist": artist}
-
-                    if normalize(name) == cur_t and normalize(artist) == cur_a:
-                        found = True
-
-                if not resp.get("next"):
-                    break
-                offset += 100
-
+            nxt = self.playlist_cache.tracks_after(
+                self.sp, playlist_id, current_title, current_artist, 1, kind=kind, wait=wait
+            )
+            if nxt:
+                return nxt[0]
         except Exception as e:
-            self.status_var.set(f"Spotify Fehler (playlist fallback): {e}")
+            self._set_status(f"Spotify Fehler (playlist fallback): {e}")
         return None
 
     def _track_to_style_text(self, tr: dict) -> str | None:
@@ -299,20 +979,18 @@ class DanceDisplayApp:
             return None
         return str(style).upper().strip()
 
-    def get_upcoming_tracks(self, n: int = 20):
+    def get_upcoming_tracks(self, n: int = 20, current: dict | None = None):
         """
         Liefert Liste von dicts: [{"name":..., "artist":...}, ...]
-        Primär aus Queue, sonst aus Playlist-Fallback (ab aktuellem Song).
+        Primär aus Queue, danach weiter aus Playlist-Fallback bzw. erkanntem Kontext
+        (ab dem letzten Queue-Song, sonst ab aktuellem Song).
+        `current` spart die zweite Abfrage des aktuellen Songs, wenn der Aufrufer ihn schon kennt.
         """
         upcoming = []
 
         # 1) Queue
         try:
-            if hasattr(sp, "queue"):
-                q = sp.queue()
-            else:
-                q = sp._get("me/player/queue")
-            queue = q.get("queue") or []
+            queue = self._fetch_queue()
             for tr in queue[:n]:
                 name = tr.get("name") or ""
                 artists = tr.get("artists") or []
@@ -325,44 +1003,39 @@ class DanceDisplayApp:
         if len(upcoming) >= n:
             return upcoming[:n]
 
-        # 2) Playlist-Fallback ab aktuellem Track
-        cur = self.get_current_track()
-        if not cur or not self.playlist_id_fallback.strip():
+        # 2) Playlist-Fallback / Kontext
+        cur = current or self.get_current_track()
+        source = self._order_source()
+        if not cur or not source:
             return upcoming[:n]
 
+        kind, item_id, wait = source
         try:
-            offset = 0
-            found = False
-            while True and len(upcoming) < n:
-                resp = sp.playlist_items(self.playlist_id_fallback, limit=100, offset=offset)
-                items = resp.get("items") or []
-
-                for it in items:
-                    tr = it.get("track") or {}
-                    name = (tr.get("name") or "").strip()
-                    artists = tr.get("artists") or []
-                    artist = (artists[0].get("name") if artists else "").strip()
-                    if not name or not artist:
-                        continue
-
-                    if found:
-                        upcoming.append({"name": name, "artist": artist})
-                        if len(upcoming) >= n:
-                            break
-
-                    if normalize(name) == normalize(cur["name"]) and normalize(artist) == normalize(cur["artist"]):
-                        found = True
-
-                if not resp.get("next") or len(upcoming) >= n:
-                    break
-                offset += 100
+            # Die Queue enthält schon die nächsten Kontext-Songs: dahinter weitermachen, sonst ab aktuellem Track
+            more = []
+            if upcoming:
+                last = upcoming[-1]
+                more = self.playlist_cache.tracks_after(
+                    self.sp, item_id, last["name"], last["artist"], n - len(upcoming), kind=kind, wait=wait
+                )
+            if not more:
+                # z.B. Autoplay-Empfehlung am Ende der Queue: Songs, die die Queue schon zeigt, nicht doppeln
+                seen = {(normalize(tr["name"]), normalize(tr["artist"])) for tr in upcoming}
+                more = [
+                    tr for tr in self.playlist_cache.tracks_after(
+                        self.sp, item_id, cur["name"], cur["artist"], n, kind=kind, wait=wait
+                    )
+                    if (normalize(tr["name"]), normalize(tr["artist"])) not in seen
+                ]
+            upcoming += more
         except Exception:
             pass
 
         return upcoming[:n]
 
-    def compute_next_dances_list(self, n: int = 30):
-        tracks = self.get_upcoming_tracks(n=n)
+    def compute_next_dances_list(self, n: int = 30, tracks: list | None = None):
+        if tracks is None:
+            tracks = self.get_upcoming_tracks(n=n)
         out = []
         for i, tr in enumerate(tracks, 1):
             style = self._track_to_style_text(tr)
@@ -380,23 +1053,27 @@ class DanceDisplayApp:
 
 
     # ================= Next computation =================
-    def compute_next_text_and_key(self, current_track: dict):
+    def get_next_track(self, current_track: dict):
         next_track = None
+        source = self._order_source()
 
         if self.use_queue_for_next:
             next_track = self.get_next_track_from_queue()
-            if (not next_track) and self.playlist_id_fallback.strip():
+            if (not next_track) and source:
                 next_track = self.get_next_track_from_playlist(
-                    self.playlist_id_fallback, current_track["name"], current_track["artist"]
+                    source[1], current_track["name"], current_track["artist"], kind=source[0], wait=source[2]
                 )
         else:
-            if self.playlist_id_fallback.strip():
+            if source:
                 next_track = self.get_next_track_from_playlist(
-                    self.playlist_id_fallback, current_track["name"], current_track["artist"]
+                    source[1], current_track["name"], current_track["artist"], kind=source[0], wait=source[2]
                 )
             if not next_track:
                 next_track = self.get_next_track_from_queue()
 
+        return next_track
+
+    def compute_next_text_and_key(self, next_track: dict | None):
         if not next_track:
             return ("", ("NEXTSTYLE", None))
 
@@ -410,24 +1087,24 @@ class DanceDisplayApp:
 
     # ================= Render =================
     def _wrap(self, text: str, fnt: font.Font) -> str:
+        if self.headless:
+            return text
         w = max(900, self.root.winfo_width() - 40)
         return wrap_for_label_if_needed(text, w, fnt)
 
     def _render_blackout(self):
-        self.info_label.config(text="")
-        self.dance_label.config(text="")
-        self.next_label.config(text="")
+        self.display.show("", "", "")
 
     def _render_overwrite(self):
-        self.info_label.config(text="")
-        self.dance_label.config(text=self._wrap(str(self.live_overwrite_style or "").upper(), self.dance_font))
-        self.next_label.config(text="")
+        self.display.show("", self._wrap(str(self.live_overwrite_style or "").upper(), self.dance_font), "")
         self._apply_alignment()
 
     def _render_last_good(self):
-        self.info_label.config(text=self.last_good_display["info"])
-        self.dance_label.config(text=self.last_good_display["dance"])
-        self.next_label.config(text=self.last_good_display["next"])
+        self.display.show(
+            self.last_good_display["info"],
+            self.last_good_display["dance"],
+            self.last_good_display["next"],
+        )
         self._apply_alignment()
 
     def force_redraw(self):
@@ -440,54 +1117,70 @@ class DanceDisplayApp:
         self._render_last_good()
 
     # ================= Update loop =================
-    def update_loop(self):
+    def poll(self):
+        """
+        Netzwerk-Teil eines Ticks: alle Spotify-Abfragen, kein Tk-Zugriff.
+        Läuft im Multi-Room-Betrieb parallel im Thread-Pool des RoomScheduler.
+        """
+        if self.blackout or (self.overwrite_enabled and self.live_overwrite_style):
+            return None
+
+        track = self.get_current_track()
+        upcoming = self.get_upcoming_tracks(n=30, current=track) if hasattr(self, "next_listbox") else None
+        next_track = self.get_next_track(track) if track else None
+        return {"track": track, "next_track": next_track, "upcoming": upcoming}
+
+    def apply(self, snapshot: dict | None) -> int:
+        """Anzeige-Teil eines Ticks (Tk-Thread). Liefert die Wartezeit bis zum nächsten Tick in ms."""
+        self._flush_status()
+
+        # Mapping ist im Multi-Room-Betrieb geteilt: „CSV neu laden“ eines anderen Raums übernehmen
+        if hasattr(self, "overwrite_list") and self.mapping.styles is not self._listed_styles:
+            self._refresh_overwrite_list()
+
         if self.blackout:
             self._render_blackout()
-            self.root.after(800, self.update_loop)
-            return
+            return 800
 
         if self.overwrite_enabled and self.live_overwrite_style:
             self._render_overwrite()
-            self.root.after(500, self.update_loop)
-            return
+            return 500
+
+        if snapshot is None:
+            # Blackout/Overwrite wurde während der Abfrage beendet -> gleich neu abfragen
+            return 500
+
+        track = snapshot["track"]
+        self._update_next_dances_panel(snapshot["upcoming"])
 
-        track = self.get_current_track()
         if not track:
             if "Fehler" not in self.status_var.get():
                 self.status_var.set("Keine Musik / keine Daten von Spotify (Display bleibt unverändert).")
-            self._update_next_dances_panel()
-            self.root.after(1500, self.update_loop)
-            return
-
-        self._update_next_dances_panel()
+            return 1500
 
         key = (track["name"], track["artist"])
-        next_text, next_key = self.compute_next_text_and_key(track)
+        next_text, next_key = self.compute_next_text_and_key(snapshot["next_track"])
 
         if key == self.current_track_key:
             if next_key != self.current_next_key:
-                self.next_label.config(text=next_text)
+                self.display.set_next(next_text)
                 self.last_good_display["next"] = next_text
                 self.current_next_key = next_key
                 self._apply_alignment()
-            self.root.after(1500, self.update_loop)
-            return
+            return 1500
 
         style = self._csv_find_style_for_track(track["name"], track["artist"])
         if not style:
             self.status_var.set("Track nicht in CSV – Display bleibt unverändert.")
             self.current_track_key = key
             self.current_next_key = next_key
-            self.root.after(1500, self.update_loop)
-            return
+            return 1500
 
         info = f"{track['name']} — {track['artist']}".strip(" —") if self.show_title_artist else ""
         info_wrapped = self._wrap(info, self.info_font) if info else ""
         dance_wrapped = self._wrap(style, self.dance_font)
 
-        self.info_label.config(text=info_wrapped)
-        self.dance_label.config(text=dance_wrapped)
-        self.next_label.config(text=next_text)
+        self.display.show(info_wrapped, dance_wrapped, next_text)
 
         self._apply_alignment()
 
@@ -499,13 +1192,22 @@ class DanceDisplayApp:
         self.current_next_key = next_key
 
         self.status_var.set("OK (Spotify verbunden).")
-        self.root.after(1500, self.update_loop)
+        return 1500
+
+    def update_loop(self):
+        if self.closed:
+            return
+        delay = self.apply(self.poll())
+        if self.clock is not None:
+            self.clock.after(delay, self.update_loop)
+        else:
+            self.root.after(delay, self.update_loop)
 
-    def _update_next_dances_panel(self):
+    def _update_next_dances_panel(self, tracks: list | None = None):
         if not hasattr(self, "next_listbox"):
             return
         try:
-            items = self.compute_next_dances_list(n=30)
+            items = self.compute_next_dances_list(n=30, tracks=tracks)
             self.next_listbox.delete(0, tk.END)
             for it in items:
                 self.next_listbox.insert(tk.END, it)
@@ -515,25 +1217,7 @@ class DanceDisplayApp:
 
     # ================= Alignment / fonts =================
     def _apply_alignment(self):
-        if self.h_align == "left":
-            anchor, justify = "w", "left"
-        elif self.h_align == "right":
-            anchor, justify = "e", "right"
-        else:
-            anchor, justify = "center", "center"
-
-        for lbl in (self.info_label, self.dance_label, self.next_label):
-            lbl.config(anchor=anchor, justify=justify)
-
-        if self.v_align == "top":
-            self.top_spacer.pack_configure(expand=False)
-            self.bot_spacer.pack_configure(expand=True)
-        elif self.v_align == "bottom":
-            self.top_spacer.pack_configure(expand=True)
-            self.bot_spacer.pack_configure(expand=False)
-        else:
-            self.top_spacer.pack_configure(expand=True)
-            self.bot_spacer.pack_configure(expand=True)
+        self.display.apply_alignment(self.h_align, self.v_align)
 
     def _apply_fonts(self):
         self.dance_font.config(size=self.size_dance)
@@ -712,13 +1396,15 @@ class DanceDisplayApp:
             return
         try:
             self.playlist_id_fallback = spotify_id_from_input(raw, expected_type="playlist")
+            self.playlist_cache.warm(self.sp, self.playlist_id_fallback)
             self.status_var.set("Playlist-Fallback gesetzt (URL/URI/ID ok).")
         except Exception as e:
             self.status_var.set(f"Ungültige Playlist (URL/URI/ID): {e}")
 
     def _refresh_overwrite_list(self):
+        self._listed_styles = self.mapping.styles
         self.overwrite_list.delete(0, tk.END)
-        for i, s in enumerate(self.styles, 1):
+        for i, s in enumerate(self._listed_styles, 1):
             self.overwrite_list.insert(tk.END, f"{i}) {s}")
 
     def toggle_blackout(self):
@@ -796,6 +1482,7 @@ class DanceDisplayApp:
         self.force_redraw()
 
     def on_close(self):
+        self.closed = True
         try:
             self.root.destroy()
         except Exception:
@@ -805,8 +1492,510 @@ class DanceDisplayApp:
         self.root.mainloop()
 
 
+# =================== Multi-Room ===================
+class RoomScheduler:
+    """
+    Treibt mehrere Räume in einem Prozess: die Spotify-Abfragen (DanceDisplayApp.poll) laufen
+    parallel im Thread-Pool, die Anzeige-Updates (DanceDisplayApp.apply) im Tk-Thread.
+    Ohne Tk-Root (nur Headless-Räume) läuft die Schleife direkt im Hauptthread.
+    """
+
+    TICK_MS = 50
+
+    def __init__(self, rooms, root=None, max_workers: int = POLL_WORKERS):
+        self.rooms = list(rooms)
+        self.root = root
+        self.pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(self.rooms))),
+                                       thread_name_prefix="dancify-poll")
+        self._due = {room: 0.0 for room in self.rooms}
+        self._inflight = {}
+
+    def tick(self):
+        now = time.monotonic()
+        self.rooms = [r for r in self.rooms if not r.closed]
+
+        for room in self.rooms:
+            if room not in self._inflight and self._due[room] <= now:
+                self._inflight[room] = self.pool.submit(room.poll)
+
+        for room, fut in list(self._inflight.items()):
+            if not fut.done():
+                continue
+            del self._inflight[room]
+            if room.closed:
+                continue
+            try:
+                delay = room.apply(fut.result())
+            except Exception as e:
+                if room.closed:
+                    continue
+                room.status_var.set(f"Fehler: {e}")
+                delay = 1500
+            self._due[room] = time.monotonic() + delay / 1000
+
+    def _tk_tick(self):
+        self.tick()
+        if not self.rooms:
+            self.root.destroy()
+            return
+        self.root.after(self.TICK_MS, self._tk_tick)
+
+    def run(self):
+        try:
+            if self.root is not None:
+                self._tk_tick()
+                self.root.mainloop()
+            else:
+                while self.rooms:
+                    self.tick()
+                    time.sleep(self.TICK_MS / 1000)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_multi_room(rooms_cfg: list[dict], record: str | None = None):
+    mapping = MappingIndex(CSV_FILE)
+    playlists = PlaylistCache()
+
+    root = None
+    if any(not cfg.get("headless") for cfg in rooms_cfg):
+        root = tk.Tk()
+        root.withdraw()
+
+    rooms = []
+    for i, cfg in enumerate(rooms_cfg, 1):
+        name = cfg.get("name") or f"Saal {i}"
+        client = create_spotify(cfg.get("cache_path") or f".cache-room{i}")
+        # Login nacheinander vor dem Start, damit sich die OAuth-Dialoge der Räume nicht überschneiden
+        client.auth_manager.get_access_token(as_dict=False)
+        if record:
+            # ein Trace pro Saal: mitschnitt.jsonl.gz -> mitschnitt.saal1.jsonl.gz (nur im Dateinamen teilen)
+            folder, filename = os.path.split(record)
+            base, dot, ext = filename.partition(".")
+            client = RecordingSpotify(client, os.path.join(folder, f"{base}.saal{i}{dot}{ext}"))
+        rooms.append(DanceDisplayApp(
+            sp=client, mapping=mapping, playlist_cache=playlists,
+            master=root, name=name, headless=bool(cfg.get("headless")),
+        ))
+
+    RoomScheduler(rooms, root=root).run()
+
+
+# =================== Record / Replay ===================
+TRACE_DROP_KEYS = {"available_markets", "images"}   # groß und von der App nie gelesen
+
+
+def _trace_compact(obj):
+    if isinstance(obj, dict):
+        return {k: _trace_compact(v) for k, v in obj.items() if k not in TRACE_DROP_KEYS}
+    if isinstance(obj, list):
+        return [_trace_compact(v) for v in obj]
+    return obj
+
+
+def _trace_call_key(method: str, args, kwargs) -> str:
+    # `fields` filtert nur die Antwort – für die Zuordnung beim Replay egal
+    kw = {k: v for k, v in kwargs.items() if k != "fields"}
+    return json.dumps([method, list(args), kw], sort_keys=True, default=str)
+
+
+class RecordingSpotify:
+    """
+    Spotify-Client-Wrapper, der jede Antwort mit Zeitstempel in eine Trace-Datei schreibt
+    (gzip, eine JSON-Zeile pro Aufruf). Alles andere wird an den echten Client durchgereicht.
+    """
+
+    FLUSH_EVERY = 20
+
+    def __init__(self, client, path: str):
+        self._client = client
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._write({"v": 1, "started": time.time()})
+        atexit.register(self.close)
+
+    def _write(self, rec: dict):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(json.dumps(rec, separators=(",", ":"), default=str) + "\n")
+            self._pending += 1
+            if self._pending >= self.FLUSH_EVERY:
+                # Sync-Flush: auch nach einem Absturz bleibt der Trace bis hierher lesbar
+                self._file.flush()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def recorded(*args, **kwargs):
+            t = round(time.monotonic() - self._start, 3)
+            rec = {"t": t, "m": name, "a": list(args), "k": kwargs}
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as e:
+                rec["e"] = str(e)
+                self._write(rec)
+                raise
+            rec["r"] = _trace_compact(result)
+            self._write(rec)
+            return result
+
+        return recorded
+
+
+class ReplaySpotify:
+    """
+    Fake-Client für das Replay: liefert zu jedem Aufruf die zuletzt aufgezeichnete Antwort
+    derselben Anfrage, deren Zeitstempel <= clock() ist. Zählt alle Aufrufe in `calls`.
+    """
+
+    # Ältere Mitschnitte enthalten current_user_playing_track (ohne shuffle_state)
+    ALIASES = {"current_playback": "current_user_playing_track"}
+
+    def __init__(self, path: str, clock):
+        self.clock = clock
+        self.calls = Counter()
+        self.misses = Counter()
+        self.duration = 0.0
+        self._methods = set()
+        self._records = {}      # call_key -> ([t...], [rec...])
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    rec = json.loads(line)
+                    if "m" not in rec:
+                        continue
+                    times, recs = self._records.setdefault(_trace_call_key(rec["m"], rec["a"], rec["k"]), ([], []))
+                    times.append(rec["t"])
+                    recs.append(rec)
+                    self._methods.add(rec["m"])
+                    self.duration = max(self.duration, rec["t"])
+            except (EOFError, json.JSONDecodeError):
+                pass    # abgebrochener Mitschnitt: alles bis zum letzten Flush verwenden
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        source = name if name in self._methods else self.ALIASES.get(name)
+        if source not in self._methods:
+            raise AttributeError(name)
+
+        def replayed(*args, **kwargs):
+            self.calls[name] += 1
+            key = _trace_call_key(source, args, kwargs)
+            times, recs = self._records.get(key, ([], []))
+            if not recs:
+                self.misses[name] += 1
+                raise LookupError(f"Nicht im Trace: {name}{tuple(args)}")
+            i = max(0, bisect.bisect_right(times, self.clock()) - 1)
+            rec = recs[i]
+            if "e" in rec:
+                raise RuntimeError(rec["e"])
+            return rec["r"]
+
+        return replayed
+
+
+def replay_trace(path: str, realtime: bool = False):
+    """
+    Spielt einen Mitschnitt ab. Echtzeit: normales Fenster mit update_loop.
+    Schnell: headless mit virtueller Uhr – ein ganzer Abend in Sekunden; ausgegeben werden
+    die Anzeige-Entscheidungen mit Zeitstempel und am Ende die Aufrufzahlen.
+    """
+    if realtime:
+        start = time.monotonic()
+        DanceDisplayApp(sp=ReplaySpotify(path, clock=lambda: time.monotonic() - start),
+                        playlist_cache=PlaylistCache(background=False)).run()
+        return
+
+    now = [0.0]
+    client = ReplaySpotify(path, clock=lambda: now[0])
+    app = DanceDisplayApp(sp=client, playlist_cache=PlaylistCache(background=False, clock=lambda: now[0]),
+                          name="Replay", headless=True)
+    app.display.clock = app.status_var.clock = lambda: now[0]
+
+    ticks = 0
+    wall = time.monotonic()
+    while now[0] <= client.duration:
+        now[0] += app.apply(app.poll()) / 1000
+        ticks += 1
+
+    print(f"Replay: {ticks} Ticks, {client.duration:.0f} s Trace in {time.monotonic() - wall:.2f} s")
+    for name, n in sorted(client.calls.items()):
+        miss = f" ({client.misses[name]} nicht im Trace)" if client.misses[name] else ""
+        print(f"  {name}: {n}{miss}")
+
+
+# =================== Soak-Test ===================
+SOAK_HOURS = 12             # simulierte Dauer (eine lange Veranstaltungsnacht)
+SOAK_WARMUP_S = 3600        # Referenzwerte erst nach der ersten simulierten Stunde
+SOAK_SAMPLE_S = 900         # Messpunkt alle 15 simulierten Minuten
+SOAK_PUMP_MS = 5            # Tk-Betrieb: so lange pro Pump Callbacks abarbeiten, dann Tk-Events verarbeiten
+SOAK_MIN_TICK_RATIO = 0.95  # mindestens so viele Update-Ticks wie bei 1,5 s pro Tick erwartet
+SOAK_LIMITS = {             # erlaubtes Wachstum zwischen Referenz und Ende
+    "rss_mb": 30,
+    "traced_mb": 10,
+    "objects_pct": 10,
+    "tk_commands": 20,
+    "tk_fonts": 0,
+    "tk_after": 5,
+}
+
+
+class VirtualClock:
+    """
+    Simulierte Zeit für den Soak-Test: after() legt Callbacks in eine Warteschlange nach Fälligkeit,
+    run_next() führt sie strikt in dieser Reihenfolge aus und setzt die Uhr auf den Fälligkeitszeitpunkt.
+    Die Zeit läuft also nur so schnell weiter, wie Callbacks tatsächlich abgearbeitet werden.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self._queue = []
+        self._seq = 0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def after(self, delay_ms: int, fn):
+        self._seq += 1
+        heapq.heappush(self._queue, (self.now + delay_ms / 1000, self._seq, fn))
+
+    def run_next(self) -> bool:
+        """Nächsten fälligen Callback ausführen; False, wenn nichts mehr ansteht."""
+        if not self._queue:
+            return False
+        due, _, fn = heapq.heappop(self._queue)
+        self.now = max(self.now, due)
+        fn()
+        return True
+
+
+class FakeSpotify:
+    """
+    Synthetischer Spotify-Abend für den Soak-Test: Songs aus der Mapping-CSV plus unbekannte Titel,
+    Songwechsel alle paar Minuten, Queue (stündlich umgestellt), Playlist-Kontext und
+    zur vollen Stunde eine Werbepause. Zeit kommt von `clock()` (simulierte Sekunden).
+    """
+
+    PLAYLIST_URI = "spotify:playlist:0SoakTestPlaylist0000"
+
+    def __init__(self, clock, csv_path: str = CSV_FILE, song_s: int = 210, length: int = 200):
+        self.clock = clock
+        self.song_s = song_s
+        self.calls = Counter()
+        df = pd.read_csv(csv_path).fillna("")
+        known = list(zip(df["song_title"].astype(str), df["artist"].astype(str))) or [("Unbekannt", "Niemand")]
+        self.tracks = []
+        for i in range(length):
+            name, artist = known[i % len(known)] if i % 7 else (f"Soak Song {i}", "Unbekannt")
+            self.tracks.append({"name": name, "artists": [{"name": artist}]})
+
+    def _pos(self) -> int:
+        return int(self.clock() // self.song_s) % len(self.tracks)
+
+    def current_playback(self):
+        self.calls["current_playback"] += 1
+        if self.clock() % 3600 < 30:
+            return {"item": None, "currently_playing_type": "ad", "shuffle_state": False}
+        return {"item": self.tracks[self._pos()], "shuffle_state": False,
+                "context": {"type": "playlist", "uri": self.PLAYLIST_URI}}
+
+    def queue(self):
+        self.calls["queue"] += 1
+        pos = self._pos()
+        upcoming = [self.tracks[(pos + i) % len(self.tracks)] for i in range(1, 21)]
+        if int(self.clock() // 3600) % 2:
+            upcoming.reverse()      # Queue umgestellt
+        return {"queue": upcoming}
+
+    def playlist_items(self, playlist_id, limit=100, offset=0, fields=None):
+        self.calls["playlist_items"] += 1
+        page = self.tracks[offset:offset + limit]
+        return {"total": len(self.tracks), "items": [{"track": tr} for tr in page]}
+
+
+def _rss_mb():
+    if PSUTIL_AVAILABLE:
+        return psutil.Process().memory_info().rss / 2 ** 20
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _soak_sample(root, t: float) -> dict:
+    gc.collect()
+    sample = {
+        "t": t,
+        "rss_mb": _rss_mb(),
+        "traced_mb": tracemalloc.get_traced_memory()[0] / 2 ** 20,
+        "objects": len(gc.get_objects()),
+    }
+    if root is not None:
+        sample["tk_commands"] = len(root.tk.splitlist(root.tk.call("info", "commands")))
+        sample["tk_fonts"] = len(root.tk.splitlist(root.tk.call("font", "names")))
+        sample["tk_after"] = len(root.tk.splitlist(root.tk.call("after", "info")))
+    return sample
+
+
+def _soak_failures(base: dict, last: dict) -> list[str]:
+    failures = []
+    for key, limit in SOAK_LIMITS.items():
+        if key == "objects_pct":
+            growth = (last["objects"] - base["objects"]) * 100 / max(1, base["objects"])
+        elif base.get(key) is None or last.get(key) is None:
+            continue
+        else:
+            growth = last[key] - base[key]
+        if growth > limit:
+            failures.append(f"{key}: +{growth:.1f} (erlaubt {limit})")
+    return failures
+
+
+def soak_test(hours: float = SOAK_HOURS, trace: str | None = None) -> bool:
+    """
+    Lässt DanceDisplayApp eine ganze Nacht im Zeitraffer gegen ein Fake-Spotify (oder einen Trace)
+    laufen und misst RSS, tracemalloc, Objektanzahl sowie Tk-Befehle/Fonts/after-Callbacks.
+    Liefert False, wenn das Wachstum nach der Aufwärmphase SOAK_LIMITS überschreitet.
+    """
+    clock = VirtualClock()
+    client = ReplaySpotify(trace, clock) if trace else FakeSpotify(clock)
+    end = client.duration if trace else hours * 3600
+
+    try:
+        root = tk.Tk()
+        root.withdraw()
+    except tk.TclError:
+        root = None
+        print("Kein Display – Soak-Test läuft headless (ohne Tk-Zähler).")
+    if _rss_mb() is None:
+        print("Hinweis: RSS nicht messbar (pip install psutil) – Speichergrenze rss_mb wird NICHT geprüft.")
+
+    tracemalloc.start()
+    # Wie im echten Betrieb über update_loop; Ticks, after-Callbacks und Playlist-TTL laufen in simulierter Zeit
+    app = DanceDisplayApp(sp=client, playlist_cache=PlaylistCache(background=False, clock=clock),
+                          master=root, name="Soak", headless=root is None, clock=clock)
+
+    samples = []
+    done = [False]
+    ticks = [0]
+
+    update_loop = app.update_loop
+
+    def counted_update_loop():
+        # update_loop plant sich über self.update_loop neu ein -> jeder Tick läuft hier durch
+        ticks[0] += 1
+        update_loop()
+
+    app.update_loop = counted_update_loop
+
+    def resize():
+        # <Configure> kommt im Betrieb ständig: force_redraw alle 15 simulierten Sekunden
+        app._on_resize()
+        clock.after(15_000, resize)
+
+    def fonts(bigger=True):
+        (app.font_bigger if bigger else app.font_smaller)()
+        clock.after(1_800_000, lambda: fonts(not bigger))
+
+    def sample():
+        samples.append(_soak_sample(root, clock.now))
+        if clock.now >= end:
+            done[0] = True
+            app.closed = True
+            if root is not None:
+                root.quit()
+            return
+        clock.after(SOAK_SAMPLE_S * 1000, sample)
+
+    def pump():
+        # Tk-Betrieb: Warteschlange in Fälligkeitsreihenfolge abarbeiten, zwischendurch Tk-Events/after zulassen
+        deadline = time.monotonic() + SOAK_PUMP_MS / 1000
+        while not done[0] and time.monotonic() < deadline and clock.run_next():
+            pass
+        if not done[0]:
+            root.after(1, pump)
+
+    wall = time.monotonic()
+    out = contextlib.nullcontext() if root is not None else open(os.devnull, "w")
+    with out as devnull, contextlib.redirect_stdout(devnull or sys.stdout):
+        sample()
+        app.update_loop()
+        resize()
+        if root is not None:
+            fonts()
+            root.after(1, pump)
+            root.mainloop()
+        else:
+            while not done[0] and clock.run_next():
+                pass
+    tracemalloc.stop()
+    ticks = ticks[0]
+    expected = int(end / 1.5)
+
+    print(f"Soak-Test: {ticks} Update-Ticks (erwartet ~{expected}), "
+          f"{end / 3600:.1f} h simuliert in {time.monotonic() - wall:.0f} s")
+    cols = [k for k in ("rss_mb", "traced_mb", "objects", "tk_commands", "tk_fonts", "tk_after") if k in samples[0]]
+    print("  Zeit   " + "".join(f"{c:>13}" for c in cols))
+    for smp in samples:
+        t = int(smp["t"])
+        vals = "".join(f"{smp[c]:>13.1f}" if isinstance(smp[c], float) else f"{str(smp[c]):>13}" for c in cols)
+        print(f"  {t // 3600:02d}:{t % 3600 // 60:02d}  {vals}")
+
+    base = next((smp for smp in samples if smp["t"] >= SOAK_WARMUP_S), samples[0])
+    failures = _soak_failures(base, samples[-1])
+    if ticks < expected * SOAK_MIN_TICK_RATIO:
+        failures.append(f"Update-Ticks: {ticks} statt ~{expected} – die Nacht wurde nicht vollständig simuliert")
+    if root is not None:
+        root.destroy()
+
+    if failures:
+        print("Soak-Test FEHLGESCHLAGEN:")
+        for f in failures:
+            print(f"  {f}")
+        return False
+    print("Soak-Test OK.")
+    return True
+
+
 def main():
-    DanceDisplayApp().run()
+    parser = argparse.ArgumentParser(description="Dancify – Tanzstil-Anzeige für Spotify")
+    parser.add_argument("--record", metavar="TRACE",
+                        help="alle Spotify-Antworten in eine Trace-Datei mitschneiden (.jsonl.gz)")
+    parser.add_argument("--replay", metavar="TRACE", help="Trace-Datei statt Spotify abspielen")
+    parser.add_argument("--fast", action="store_true",
+                        help="Replay so schnell wie möglich (ohne Fenster, mit Protokoll)")
+    parser.add_argument("--soak", action="store_true",
+                        help="Langzeittest: eine Nacht im Zeitraffer gegen Fake-Spotify (oder --replay TRACE)")
+    parser.add_argument("--hours", type=float, default=SOAK_HOURS, help="simulierte Dauer für --soak")
+    args = parser.parse_args()
+
+    if args.soak:
+        sys.exit(0 if soak_test(hours=args.hours, trace=args.replay) else 1)
+    elif args.replay:
+        replay_trace(args.replay, realtime=not args.fast)
+    elif ROOMS:
+        run_multi_room(ROOMS, record=args.record)
+    elif args.record:
+        DanceDisplayApp(sp=RecordingSpotify(create_spotify(), args.record)).run()
+    else:
+        DanceDisplayApp().run()
 
 
 if __name__ == "__main__":